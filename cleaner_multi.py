@@ -17,15 +17,39 @@ Funcionalidades:
  - Dry-run, logs, modo não-interativo (--yes)
  - Cancelamento digitando exit/sair/quit/q em prompts
 """
-from _future_ import annotations
+from __future__ import annotations
 import os
 import sys
 import re
 import json
 import argparse
+import array
 import shutil
+import mmap
+import queue
+import atexit
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Set, Tuple, Optional
+from typing import List, Dict, Set, Tuple, Optional, Iterator
+
+try:
+    import re2  # optional: google-re2 / pyre2, linear-time engine
+except ImportError:
+    re2 = None
+try:
+    import hyperscan  # optional: many-pattern scan for unused exports
+except ImportError:
+    hyperscan = None
+try:
+    import orjson  # optional: faster cache (de)serialization
+except ImportError:
+    orjson = None
+try:
+    import fcntl  # reflink (FICLONE) snapshots on Linux
+except ImportError:
+    fcntl = None
 
 # ----------------------------
 # CONFIG
@@ -43,12 +67,18 @@ DEFAULT_CONFIG = {
         "php": [".php"]
     },
     "excluded_dirs": ["node_modules", ".git", "dist", "build", "coverage", ".next"],
+    "skip_hidden_dirs": False,
+    "dir_exclude_globs": [],
     "log_dir": "logs",
     "backup_dir": "backup_snapshots",
     "cache_file": ".cleaner_cache.json",
     "safe_mode": True,
+    "snapshot_links": True,
+    "snapshot_hardlinks": False,
     "skip_patterns": [".d.ts", ".spec.", ".test.*"],
-    "allow_undo_count": 12
+    "allow_undo_count": 12,
+    "import_scan_bytes": 16384,
+    "inplace_edit_bytes": 1048576
 }
 
 EXIT_WORDS = {"exit", "sair", "quit", "q"}
@@ -62,9 +92,18 @@ LOG_DIR = CFG["log_dir"]
 BACKUP_DIR = CFG["backup_dir"]
 CACHE_FILE = CFG["cache_file"]
 EXCLUDED_DIRS = set(CFG["excluded_dirs"])
+SKIP_HIDDEN_DIRS = CFG["skip_hidden_dirs"]
+DIR_EXCLUDE_GLOBS = CFG["dir_exclude_globs"]
 SAFE_MODE = CFG["safe_mode"]
+SNAPSHOT_LINKS = CFG["snapshot_links"]
+SNAPSHOT_HARDLINKS = CFG["snapshot_hardlinks"]
 SKIP_PATTERNS = CFG["skip_patterns"]
 ALLOW_UNDO_COUNT = CFG["allow_undo_count"]
+MAX_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+IMPORT_SCAN_BYTES = CFG["import_scan_bytes"]
+INPLACE_EDIT_BYTES = CFG["inplace_edit_bytes"]
+# CLEANER_FULL_READ=1 turns the import-header cap off for exotic codebases
+FULL_READ = os.environ.get("CLEANER_FULL_READ") == "1"
 
 # Build flat extension -> language map
 EXT_LANG_MAP: Dict[str, str] = {}
@@ -72,21 +111,24 @@ for lang, exts in CFG["file_extensions_map"].items():
     for e in exts:
         EXT_LANG_MAP[e] = lang
 
-os.makedirs(LOG_DIR, exist_ok=True)
-os.makedirs(BACKUP_DIR, exist_ok=True)
 if not os.path.isdir(PROJECT_ROOT):
     PROJECT_ROOT = "."
 
-LOG_PATH = os.path.join(LOG_DIR, datetime.now().strftime("%Y%m%d_%H%M%S.log"))
+# log file is created on the first log() call; --help does no filesystem setup
+LOG_PATH: Optional[str] = None
 
 # ----------------------------
 # UTILITIES
 # ----------------------------
 def log(msg: str):
+    global LOG_PATH
     ts = datetime.now().isoformat(sep=" ", timespec="seconds")
     line = f"[{ts}] {msg}"
     print(line)
     try:
+        if LOG_PATH is None:
+            os.makedirs(LOG_DIR, exist_ok=True)
+            LOG_PATH = os.path.join(LOG_DIR, datetime.now().strftime("%Y%m%d_%H%M%S.log"))
         with open(LOG_PATH, "a", encoding="utf-8") as f:
             f.write(line + "\n")
     except Exception:
@@ -112,151 +154,440 @@ def ask_yes_no(prompt: str, default: bool = False, assume_yes: bool = False) ->
     return ans.strip().lower().startswith("s")
 
 # ----------------------------
-# CACHE: simple cache of file list mtimes
+# CACHE: dir mtimes, file list [path, mtime_ns, size] + extracted imports per file
 # ----------------------------
 import fnmatch
 
-def build_file_list(root: str, use_cache: bool = True) -> List[str]:
+# all skip globs folded into one alternation: a single C-level match per file name
+SKIP_RE = re.compile("|".join(fnmatch.translate(p) for p in SKIP_PATTERNS)) if SKIP_PATTERNS else None
+# globs are relative to project_root: "generated/**" prunes <root>/generated itself
+DIR_EXCLUDE_RES = [re.compile(fnmatch.translate(g[:-3] if g.endswith("/**") else g)) for g in DIR_EXCLUDE_GLOBS]
+
+def is_dir_excluded(name: str, rel_path: str) -> bool:
+    if name in EXCLUDED_DIRS:
+        return True
+    if SKIP_HIDDEN_DIRS and name.startswith("."):
+        return True
+    return any(r.match(rel_path) for r in DIR_EXCLUDE_RES)
+
+def scan_tree(root: str, dirs_out: Optional[list] = None):
+    # iterative os.scandir walk; excluded dirs are pruned before descending and
+    # DirEntry type/stat data is reused instead of extra stat() calls.
+    # dirs_out collects [dir, mtime_ns] taken before each dir is listed.
+    # The script's own log/backup dirs change on every run and are never walked
+    own_dirs = {os.path.abspath(LOG_DIR), os.path.abspath(BACKUP_DIR)}
+    if dirs_out is not None:
+        try:
+            dirs_out.append([root, os.stat(root).st_mtime_ns])
+        except OSError:
+            pass
+    stack = [(root, "")]
+    while stack:
+        path, rel = stack.pop()
+        try:
+            it = os.scandir(path)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        if not is_dir_excluded(e.name, rel + e.name) and os.path.abspath(e.path) not in own_dirs:
+                            if dirs_out is not None:
+                                dirs_out.append([e.path, e.stat(follow_symlinks=False).st_mtime_ns])
+                            stack.append((e.path, rel + e.name + "/"))
+                    elif e.is_file():
+                        yield e
+                except OSError:
+                    # broken symlink or entry vanished mid-scan
+                    continue
+
+def load_cache() -> dict:
     try:
-        if use_cache and os.path.exists(CACHE_FILE):
-            with open(CACHE_FILE, "r", encoding="utf-8") as f:
-                cache = json.load(f)
-            if cache.get("root") == os.path.abspath(root):
-                entries = cache.get("files", [])
-                ok = True
-                for e in entries:
-                    p = e.get("path")
-                    if not p or not os.path.exists(p):
-                        ok = False
-                        break
-                    if os.path.getmtime(p) != e.get("mtime"):
-                        ok = False
-                        break
-                if ok:
-                    return [e["path"] for e in entries]
+        with open(CACHE_FILE, "rb") as f:
+            data = f.read()
+        return orjson.loads(data) if orjson is not None else json.loads(data)
     except Exception:
-        pass
+        return {}
 
-    files: List[str] = []
-    for r, dirs, fs in os.walk(root, topdown=True):
-        dirs[:] = [d for d in dirs if d not in EXCLUDED_DIRS]
-        for name in fs:
-            skip = False
-            for patt in SKIP_PATTERNS:
-                if fnmatch.fnmatch(name, patt):
-                    skip = True
-                    break
-            if skip:
-                continue
-            _, ext = os.path.splitext(name)
-            if ext in EXT_LANG_MAP:
-                files.append(os.path.normpath(os.path.join(r, name)))
+def save_cache(cache: dict):
+    # compact (no indent) and written through a temp file + os.replace, so a
+    # crash mid-write never leaves a truncated cache that forces a full rebuild
+    tmp = None
     try:
-        entries = []
-        for p in files:
+        data = orjson.dumps(cache) if orjson is not None else json.dumps(cache, separators=(",", ":")).encode("utf-8")
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(CACHE_FILE)), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp creates the file 0600; give it the mode a plain open() would
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp, 0o666 & ~umask)
+        os.replace(tmp, CACHE_FILE)
+        # the replace itself changes the mtime of the cache's dir; it is stamped on
+        # the cache file so build_file_index can still validate that dir
+        dir_mtime = os.stat(os.path.dirname(os.path.abspath(CACHE_FILE))).st_mtime_ns
+        os.utime(CACHE_FILE, ns=(dir_mtime, dir_mtime))
+    except Exception:
+        if tmp:
             try:
-                m = os.path.getmtime(p)
-            except Exception:
-                m = 0
-            entries.append({"path": p, "mtime": m})
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump({"root": os.path.abspath(root), "files": entries}, f, indent=2)
+                os.remove(tmp)
+            except OSError:
+                pass
+
+def build_file_index(root: str, use_cache: bool = True) -> Tuple[List[str], Dict[str, Tuple[int, int]]]:
+    # (files, {path: (mtime_ns, size)}). Stat data comes from the walk's DirEntry
+    # or from validating the cache, so callers never stat the files again
+    cache = load_cache()
+    if cache.get("root") != os.path.abspath(root):
+        cache = {}
+    try:
+        if use_cache and cache:
+            # a file added/removed/renamed anywhere changes its directory's mtime;
+            # the few dirs are checked first so a stale cache fails fast
+            dirs = cache["dirs"]
+            cache_dir = os.path.dirname(os.path.abspath(CACHE_FILE))
+            cache_dir_mtime = os.stat(CACHE_FILE).st_mtime_ns
+            if all(os.stat(d).st_mtime_ns == (cache_dir_mtime if os.path.abspath(d) == cache_dir else m)
+                   for d, m in dirs):
+                stats: Dict[str, Tuple[int, int]] = {}
+                for p, m, size in cache["files"]:
+                    st = os.stat(p)
+                    if st.st_mtime_ns != m or st.st_size != size:
+                        break
+                    stats[sys.intern(p)] = (m, size)
+                else:
+                    return list(stats), stats
     except Exception:
         pass
-    return files
+
+    files: List[str] = []
+    stats = {}
+    entries = []
+    dirs = []
+    for e in scan_tree(root, dirs):
+        _, ext = os.path.splitext(e.name)
+        if ext not in EXT_LANG_MAP:
+            continue
+        if SKIP_RE and SKIP_RE.match(e.name):
+            continue
+        # interned: the same path strings are hashed over and over in set lookups
+        p = sys.intern(os.path.normpath(e.path))
+        try:
+            st = e.stat()
+            m, size = st.st_mtime_ns, st.st_size
+        except OSError:
+            m, size = 0, 0
+        files.append(p)
+        stats[p] = (m, size)
+        entries.append([p, m, size])
+    # per-file imports are kept; analyze_project revalidates them by mtime/size
+    cache["root"] = os.path.abspath(root)
+    cache["dirs"] = dirs
+    cache["files"] = entries
+    save_cache(cache)
+    return files, stats
+
+def build_file_list(root: str, use_cache: bool = True) -> List[str]:
+    return build_file_index(root, use_cache=use_cache)[0]
+
+# in-process memo of file contents, so several passes in one command read each file once;
+# single-pass readers (the analysis workers) use memo=False to hold one file at a time
+TEXT_MEMO: Dict[str, str] = {}
+
+def read_text(path: str, memo: bool = True) -> str:
+    text = TEXT_MEMO.get(path)
+    if text is None:
+        with open(path, "r", encoding="utf-8", errors="ignore") as fh:
+            text = fh.read()
+        if memo:
+            TEXT_MEMO[path] = text
+    return text
+
+def read_import_text(path: str, handler: LanguageHandler, memo: bool = True) -> str:
+    # languages whose imports must precede the code (handler.full_read False)
+    # only need the head of the file; the cut is moved back to the last full line
+    if FULL_READ or handler.full_read:
+        return read_text(path, memo=memo)
+    text = TEXT_MEMO.get(path)
+    if text is not None:
+        return text
+    # read in binary so the cap counts bytes; cutting at a newline also keeps
+    # multi-byte UTF-8 sequences whole
+    with open(path, "rb") as fh:
+        head = fh.read(IMPORT_SCAN_BYTES)
+    if len(head) == IMPORT_SCAN_BYTES:
+        head = head[:head.rfind(b"\n") + 1]
+    return head.decode("utf-8", errors="ignore")
+
+def imports_cache(cache: dict, root: str) -> Dict[str, list]:
+    # per-file imports, only when built for this root with the same read mode
+    if cache.get("root") != os.path.abspath(root) or cache.get("full_read") != FULL_READ:
+        return {}
+    return cache.get("imports", {})
 
 # ----------------------------
 # LANGUAGE HANDLER
 # ----------------------------
+_INLINE_FLAGS = ((re.I, "i"), (re.M, "m"), (re.S, "s"), (re.X, "x"))
+
+def combine_regexes(regexes: List[re.Pattern]):
+    # one alternation for all patterns of a language; each pattern is wrapped in
+    # its own group so a match tells which pattern fired and where its captures are
+    parts: List[str] = []
+    spans: List[Tuple[int, int, int]] = []
+    group = 1
+    for rx in regexes:
+        flags = "".join(c for f, c in _INLINE_FLAGS if rx.flags & f)
+        parts.append(f"((?{flags}:{rx.pattern}))")
+        spans.append((group, group + 1, group + rx.groups))
+        group += rx.groups + 1
+    return "|".join(parts), spans
+
+def compile_fast(src):
+    if re2 is not None:
+        try:
+            return re2.compile(src)
+        except Exception:
+            pass
+    return re.compile(src)
+
+# statement shapes statement_span may extend across lines (bytes, matched on
+# the text between the statement start and the capture)
+BRACE_IMPORT_RE = re.compile(rb"(?:^|[\n;])[ \t]*(import\s+(?:type\s+)?(?:[\w$]+\s*,\s*)?\{[^{}]*\}\s*from\s*['\"])\Z")
+CALL_IMPORT_RE = re.compile(rb"(?:require|include|import)(?:_once)?\s*\(\s*['\"]\Z")
+OPEN_PAREN_RE = re.compile(rb"[ \t]*\(")
+
 class LanguageHandler:
-    def _init_(self, name: str, extensions: List[str], import_regexes: List[re.Pattern]):
+    def __init__(self, name: str, extensions: List[str], import_regexes: List[re.Pattern], full_read: bool = True):
         self.name = name
         self.extensions = extensions
         self.import_regexes = import_regexes
+        # False when the language puts all imports before any code (java, c#, go)
+        self.full_read = full_read
+        src, self.group_spans = combine_regexes(import_regexes)
+        self.combined_regex = compile_fast(src)
+        # bytes twin, for scanning/editing raw file contents (mmap) without decoding
+        self.combined_regex_b = compile_fast(src.encode())
+        # state tied to one file set; reset by bind() when a new set comes in
+        self.files_src: Optional[Set[str]] = None
+        self.ns_map: Optional[Dict[str, str]] = None
+        self.resolve_memo: Dict[Tuple[str, str], Optional[str]] = {}
+
+    def find_imports(self, file_text) -> Iterator[Tuple[str, int, bool, Tuple[int, int]]]:
+        # single pass over the text (str, or bytes/mmap) for all patterns of the language;
+        # yields (import, offset, captured, match span) where captured is False for
+        # group-less patterns
+        rx = self.combined_regex if isinstance(file_text, str) else self.combined_regex_b
+        for m in rx.finditer(file_text):
+            for outer, first, last in self.group_spans:
+                if m.group(outer) is None:
+                    continue
+                if first > last:
+                    yield m.group(0), m.start(), False, m.span()
+                    break
+                # find first non-empty capturing group of the pattern that matched
+                for i in range(first, last + 1):
+                    val = m.group(i)
+                    if val:
+                        yield val, m.start(i), True, m.span()
+                        break
+                break
 
     def extract_imports(self, file_text: str) -> List[str]:
-        found: List[str] = []
-        for rx in self.import_regexes:
-            for m in rx.finditer(file_text):
-                # find first non-empty capturing group
-                g = None
-                if m.lastindex:
-                    for i in range(1, m.lastindex + 1):
-                        try:
-                            val = m.group(i)
-                        except IndexError:
-                            val = None
-                        if val:
-                            g = val
-                            break
-                else:
-                    g = m.group(0)
-                if g:
-                    found.append(g)
-        return found
+        return [imp for imp, _, _, _ in self.find_imports(file_text) if imp]
+
+    def statement_span(self, buf, pos: int, m_start: int, m_end: int) -> Optional[Tuple[int, int]]:
+        # (line_start, newline_offset) covering the import statement whose capture
+        # is at pos. The span starts at the match's first non-blank byte (^\s*
+        # patterns begin on the blank lines above) and only crosses lines for a
+        # bracketed list: import {\n a\n} from "x", require(\n "x"\n) and
+        # from x import (\n a\n). Anything else that crosses lines (a go import
+        # block, the word "import" in a comment above) is cut to the capture's line
+        start = m_start
+        while start < pos and buf[start:start + 1].isspace():
+            start += 1
+        head = buf[start:pos]
+        end = m_end
+        if b"\n" in head:
+            m = BRACE_IMPORT_RE.search(head)
+            if m:
+                start += m.start(1)
+            elif self.name == "go" or not CALL_IMPORT_RE.match(head):
+                start = end = pos
+        elif buf[m_end - 6:m_end] == b"import" and OPEN_PAREN_RE.match(buf, m_end):
+            # python: "from x import (" runs up to the list's ")"
+            end = buf.find(b")", m_end)
+            if end == -1:
+                return None
+        line_start = buf.rfind(b"\n", 0, start) + 1
+        line_end = buf.find(b"\n", end)
+        return line_start, len(buf) if line_end == -1 else line_end
+
+    def import_line_spans(self, buf, target_folder: str, normalize: bool = False) -> List[Tuple[int, int]]:
+        # (line_start, newline_offset) of each run of lines in the raw bytes holding
+        # an import statement that points into target_folder, in file order
+        target = target_folder.encode()
+        # substring pre-check: most files never mention the folder, skip the regex.
+        # Normalized imports may use "\\" in the file, so only a segment must appear
+        needle = max(target.split(b"/"), key=len) if normalize else target
+        if buf.find(needle) == -1:
+            return []
+        found: List[Tuple[int, int]] = []
+        for imp, pos, captured, (m_start, m_end) in self.find_imports(buf):
+            if not captured:
+                continue
+            if normalize:
+                imp = imp.replace(b"\\", b"/")
+            if target not in imp:
+                continue
+            span = self.statement_span(buf, pos, m_start, m_end)
+            if span:
+                found.append(span)
+        # statements sharing a line are edited as one run
+        spans: List[Tuple[int, int]] = []
+        for start, end in sorted(found):
+            if spans and start <= spans[-1][1]:
+                spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+            else:
+                spans.append((start, end))
+        return spans
+
+    def probe(self, candidate: str, all_files_set: Set[str]) -> Optional[str]:
+        # candidate is already normalized, so only "<candidate><ext>" and
+        # "<candidate>/index<ext>" need building; no normpath per extension
+        index_base = os.path.normpath(os.path.join(candidate, "index"))
+        for ext in self.extensions:
+            c_ext = candidate if candidate.endswith(ext) else candidate + ext
+            if c_ext in all_files_set:
+                return c_ext
+            idx = index_base + ext
+            if idx in all_files_set:
+                return idx
+        return None
+
+    def bind(self, all_files_set: Set[str]):
+        if self.files_src is not all_files_set:
+            self.files_src = all_files_set
+            self.ns_map = None
+            self.resolve_memo = {}
+
+    def namespace_map(self, all_files_set: Set[str]) -> Dict[str, str]:
+        # "com.foo.Bar" -> PROJECT_ROOT/com/foo/Bar.java, built once per file set
+        self.bind(all_files_set)
+        if self.ns_map is None:
+            ns_map: Dict[str, str] = {}
+            for ext in reversed(self.extensions):
+                for f in all_files_set:
+                    if not f.endswith(ext):
+                        continue
+                    rel = os.path.relpath(f[:-len(ext)], PROJECT_ROOT)
+                    if rel.startswith("..") or "." in rel:
+                        continue
+                    ns_map[rel.replace(os.sep, ".")] = f
+            self.ns_map = ns_map
+        return self.ns_map
 
     def resolve_import(self, base_file: str, imp: str, all_files_set: Set[str]) -> Optional[str]:
-        imp = imp.strip()
+        # memoized per (base_dir, import); sibling files share their relative
+        # imports and unresolved (None) results are cached too. base_dir only
+        # matters for relative imports, so it is left out of the key otherwise
+        imp = imp.strip().strip('"\'')
         if not imp:
             return None
-        imp = imp.strip('"\'')
+        base_dir = os.path.dirname(base_file) if imp.startswith(".") or imp.startswith("/") else ""
+        self.bind(all_files_set)
+        key = (base_dir, imp)
+        try:
+            return self.resolve_memo[key]
+        except KeyError:
+            pass
+        target = self.resolve_uncached(base_dir, imp, all_files_set)
+        self.resolve_memo[key] = target
+        return target
+
+    def resolve_uncached(self, base_dir: str, imp: str, all_files_set: Set[str]) -> Optional[str]:
         # relative
         if imp.startswith(".") or imp.startswith("/"):
-            base_dir = os.path.dirname(base_file)
             candidate = os.path.normpath(os.path.join(base_dir, imp))
-            for ext in self.extensions:
-                c_ext = candidate if candidate.endswith(ext) else candidate + ext
-                idx = os.path.join(candidate, "index" + ext)
-                for possible in (c_ext, idx):
-                    if os.path.normpath(possible) in all_files_set:
-                        return os.path.normpath(possible)
-            if os.path.normpath(candidate) in all_files_set:
-                return os.path.normpath(candidate)
+            found = self.probe(candidate, all_files_set)
+            if found:
+                return found
+            if candidate in all_files_set:
+                return candidate
             return None
         # path-like
         if "/" in imp:
             candidate = os.path.normpath(os.path.join(PROJECT_ROOT, imp))
-            for ext in self.extensions:
-                c_ext = candidate if candidate.endswith(ext) else candidate + ext
-                idx = os.path.join(candidate, "index" + ext)
-                for possible in (c_ext, idx):
-                    if os.path.normpath(possible) in all_files_set:
-                        return os.path.normpath(possible)
+            found = self.probe(candidate, all_files_set)
+            if found:
+                return found
+        # import static com.foo.Helper.x -> the member's class, com.foo.Helper
+        if self.name == "java" and imp.startswith("static"):
+            parts = imp.split(None, 1)
+            if len(parts) == 2 and parts[0] == "static":
+                imp = parts[1].rpartition(".")[0]
         # namespace-style (java, csharp)
         if "." in imp and self.name in ("java", "csharp"):
+            if "/" not in imp:
+                return self.namespace_map(all_files_set).get(imp)
             candidate = os.path.normpath(os.path.join(PROJECT_ROOT, imp.replace('.', os.sep)))
             for ext in self.extensions:
                 c_ext = candidate + ext
-                if os.path.normpath(c_ext) in all_files_set:
-                    return os.path.normpath(c_ext)
+                if c_ext in all_files_set:
+                    return c_ext
         return None
 
-# compile regexes for languages
+# import patterns per language as (source, flags); compiled on first use by
+# get_handler, so commands that never touch a language don't pay for it
 JS_IMPORTS = [
-    re.compile(r"import\s+[^'\"]+from\s+['\"]([^'\"]+)['\"]"),
-    re.compile(r"require\(\s*['\"]([^'\"]+)['\"]\s*\)"),
-    re.compile(r"import\(\s*['\"]([^'\"]+)['\"]\s*\)")
+    (r"import\s+[^'\"]+from\s+['\"]([^'\"]+)['\"]", 0),
+    (r"require\(\s*['\"]([^'\"]+)['\"]\s*\)", 0),
+    (r"import\(\s*['\"]([^'\"]+)['\"]\s*\)", 0)
 ]
 TS_IMPORTS = JS_IMPORTS.copy()
 PY_IMPORTS = [
-    re.compile(r"^\s*from\s+([\w\.]+)\s+import", re.M),
-    re.compile(r"^\s*import\s+([\w\.]+)", re.M)
+    (r"^\s*from\s+([\w\.]+)\s+import", re.M),
+    (r"^\s*import\s+([\w\.]+)", re.M)
 ]
-JAVA_IMPORTS = [re.compile(r"^\s*import\s+([\w\.\]+)\s;", re.M)]
-CSHARP_IMPORTS = [re.compile(r"^\s*using\s+([\w\.]+)\s*;", re.M)]
-CPP_IMPORTS = [re.compile(r"^\s*#include\s+[\"<]([^\">]+)[\">]", re.M)]
-GO_IMPORTS = [re.compile(r"import\s+\(?\s*['\"]([^'\"]+)['\"]", re.M), re.compile(r"\bimport\s*\(.*?\)", re.S)]
-PHP_IMPORTS = [re.compile(r"(?:require_once|require|include_once|include)\s*\(?\s*['\"]([^'\"]+)['\"]\s*\)?")]
+# static imports keep the keyword ("static com.foo.Helper.x") for resolve_uncached
+JAVA_IMPORTS = [(r"^\s*import\s+((?:static\s+)?[\w.]+)\s*;", re.M)]
+CSHARP_IMPORTS = [(r"^\s*using\s+([\w\.]+)\s*;", re.M)]
+CPP_IMPORTS = [(r"^\s*#include\s+[\"<]([^\">]+)[\">]", re.M)]
+GO_IMPORTS = [(r"import\s+\(?\s*['\"]([^'\"]+)['\"]", re.M), (r"\bimport\s*\(.*?\)", re.S)]
+PHP_IMPORTS = [(r"(?:require_once|require|include_once|include)\s*\(?\s*['\"]([^'\"]+)['\"]\s*\)?", 0)]
+
+LANG_PATTERNS: Dict[str, List[Tuple[str, int]]] = {
+    "javascript": JS_IMPORTS,
+    "typescript": TS_IMPORTS,
+    "python": PY_IMPORTS,
+    "java": JAVA_IMPORTS,
+    "csharp": CSHARP_IMPORTS,
+    "cpp": CPP_IMPORTS,
+    "go": GO_IMPORTS,
+    "php": PHP_IMPORTS,
+}
+# languages whose imports all come before any code
+HEADER_IMPORT_LANGS = {"java", "csharp", "go"}
 
 LANG_HANDLERS: Dict[str, LanguageHandler] = {}
-LANG_HANDLERS["javascript"] = LanguageHandler("javascript", CFG["file_extensions_map"]["javascript"], JS_IMPORTS)
-LANG_HANDLERS["typescript"] = LanguageHandler("typescript", CFG["file_extensions_map"]["typescript"], TS_IMPORTS)
-LANG_HANDLERS["python"] = LanguageHandler("python", CFG["file_extensions_map"]["python"], PY_IMPORTS)
-LANG_HANDLERS["java"] = LanguageHandler("java", CFG["file_extensions_map"]["java"], JAVA_IMPORTS)
-LANG_HANDLERS["csharp"] = LanguageHandler("csharp", CFG["file_extensions_map"]["csharp"], CSHARP_IMPORTS)
-LANG_HANDLERS["cpp"] = LanguageHandler("cpp", CFG["file_extensions_map"]["cpp"], CPP_IMPORTS)
-LANG_HANDLERS["go"] = LanguageHandler("go", CFG["file_extensions_map"]["go"], GO_IMPORTS)
-LANG_HANDLERS["php"] = LanguageHandler("php", CFG["file_extensions_map"]["php"], PHP_IMPORTS)
+LANG_HANDLERS_LOCK = threading.Lock()
+
+def get_handler(lang: Optional[str]) -> Optional[LanguageHandler]:
+    handler = LANG_HANDLERS.get(lang)
+    if handler is None and lang in LANG_PATTERNS:
+        # worker threads may ask concurrently; build each handler once
+        with LANG_HANDLERS_LOCK:
+            handler = LANG_HANDLERS.get(lang)
+            if handler is None:
+                handler = LanguageHandler(lang, CFG["file_extensions_map"][lang],
+                                          [re.compile(p, flags) for p, flags in LANG_PATTERNS[lang]],
+                                          full_read=lang not in HEADER_IMPORT_LANGS)
+                LANG_HANDLERS[lang] = handler
+    return handler
+
+# import blocks: import ( "fmt" \n "os" )
+GO_BLOCK = re.compile(r"import\s*\((.*?)\)", re.S)
 
 # ----------------------------
 # util: detect language by extension
@@ -268,56 +599,104 @@ def detect_language_for_file(path: str) -> Optional[str]:
 # ----------------------------
 # analyze project graph
 # ----------------------------
-def analyze_project(root: str, use_cache: bool = True) -> Tuple[List[str], Dict[str, Set[str]], Dict[str, Set[str]]]:
+def read_and_extract(f: str) -> Tuple[str, Optional[LanguageHandler], List[str]]:
+    lang = detect_language_for_file(f)
+    if not lang:
+        return f, None, []
+    handler = get_handler(lang)
+    if not handler:
+        return f, None, []
+    try:
+        text = read_import_text(f, handler, memo=False)
+    except Exception:
+        return f, None, []
+    imps: List[str] = []
+    if lang == "go":
+        for m in GO_BLOCK.finditer(text):
+            block = m.group(1)
+            for line in block.splitlines():
+                s = line.strip().strip('"')
+                if s:
+                    imps.append(s)
+        for rx in handler.import_regexes:
+            for m in rx.finditer(text):
+                if m.lastindex and m.lastindex >= 1:
+                    g = m.group(1)
+                    if g:
+                        imps.append(g)
+    else:
+        imps = handler.extract_imports(text)
+    return f, handler, imps
+
+def analyze_project(root: str, use_cache: bool = True,
+                    imports_out: Optional[Dict[str, List[str]]] = None) -> Tuple[List[str], List[array.array], List[array.array]]:
+    # imports_out, when given, receives the extracted imports per file
     log("Iniciando análise do projeto...")
-    all_files = build_file_list(root, use_cache=use_cache)
-    all_files_set = set(all_files)
-    referenced_by: Dict[str, Set[str]] = {f: set() for f in all_files}
-    imports_of: Dict[str, Set[str]] = {f: set() for f in all_files}
+    all_files, stats = build_file_index(root, use_cache=use_cache)
+    all_files_set = frozenset(all_files)
+    # graph as adjacency arrays indexed like all_files: ref_by[i] holds the
+    # indices of files importing all_files[i], imp_of[i] the ones it imports
+    idx = {p: i for i, p in enumerate(all_files)}
+    ref_by = [array.array("I") for _ in all_files]
+    imp_of = [array.array("I") for _ in all_files]
 
+    # imports of files whose mtime and size are unchanged come from the cache
+    cache = load_cache()
+    cached = imports_cache(cache, root) if use_cache else {}
+    fresh: Dict[str, list] = {}
+    imports_by_file: Dict[str, List[str]] = {}
+    to_read: List[str] = []
     for f in all_files:
-        lang = detect_language_for_file(f)
-        if not lang:
-            continue
-        handler = LANG_HANDLERS.get(lang)
-        if not handler:
-            continue
-        try:
-            with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-                text = fh.read()
-        except Exception:
-            continue
-        imps: List[str] = []
-        if lang == "go":
-            for m in re.finditer(r"import\s*\((.*?)\)", text, re.S):
-                block = m.group(1)
-                for line in block.splitlines():
-                    s = line.strip().strip('"')
-                    if s:
-                        imps.append(s)
-            for rx in handler.import_regexes:
-                for m in rx.finditer(text):
-                    if m.lastindex and m.lastindex >= 1:
-                        g = m.group(1)
-                        if g:
-                            imps.append(g)
+        mtime, size = stats[f]
+        entry = cached.get(f)
+        if entry and entry[0] == mtime and entry[1] == size:
+            imports_by_file[f] = entry[2]
+            fresh[f] = entry
         else:
-            imps = handler.extract_imports(text)
+            to_read.append(f)
+            fresh[f] = [mtime, size, None]
+
+    # reads + regex run in worker threads; results are only collected here
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        for f, handler, imps in pool.map(read_and_extract, to_read):
+            if not handler:
+                del fresh[f]
+                continue
+            imports_by_file[f] = imps
+            fresh[f][2] = imps
+
+    if cache.get("root") == os.path.abspath(root):
+        cache["imports"] = fresh
+        cache["full_read"] = FULL_READ
+        save_cache(cache)
+    if imports_out is not None:
+        imports_out.update(imports_by_file)
+
+    # graph is only mutated on the main thread, in input order
+    for f_idx, f in enumerate(all_files):
+        imps = imports_by_file.get(f)
+        if not imps:
+            continue
+        handler = get_handler(detect_language_for_file(f))
+        seen: Set[int] = set()
         for imp in imps:
             target = handler.resolve_import(f, imp, all_files_set)
             if target:
-                referenced_by[target].add(f)
-                imports_of[f].add(target)
-    return all_files, referenced_by, imports_of
+                t_idx = idx[target]
+                if t_idx in seen:
+                    continue
+                seen.add(t_idx)
+                ref_by[t_idx].append(f_idx)
+                imp_of[f_idx].append(t_idx)
+    return all_files, ref_by, imp_of
 
 # ----------------------------
 # dead file heuristics
 # ----------------------------
-def detect_dead_files(all_files: List[str], referenced_by: Dict[str, Set[str]]) -> List[str]:
+def detect_dead_files(all_files: List[str], ref_by: List[array.array]) -> List[str]:
     dead: List[str] = []
-    for f in all_files:
-        refs = referenced_by.get(f)
-        if refs:
+    for i, f in enumerate(all_files):
+        if ref_by[i]:
             continue
         path_norm = f.replace("\\", "/").lower()
         basename = os.path.basename(f).lower()
@@ -339,16 +718,53 @@ def detect_dead_files(all_files: List[str], referenced_by: Dict[str, Set[str]])
 JS_EXPORT_DEF = re.compile(r"export\s+(?:default\s+)?(?:function|const|let|var|class)\s+([A-Za-z0-9_]+)")
 JS_NAMED_EXPORTS = re.compile(r"export\s*\{([^}]+)\}")
 PY_DEF = re.compile(r"^\s*def\s+([A-Za-z0-9_]+)\s*\(|^\s*class\s+([A-Za-z0-9_]+)\s*\(", re.M)
-PY_ALL = re.compile(r"_all_\s*=\s*\[(.*?)\]", re.S)
+PY_ALL = re.compile(r"__all__\s*=\s*\[(.*?)\]", re.S)
+WORD_RE = re.compile(r"\w+")
+
+def hyperscan_name_files(exports_map: Dict[str, List[str]], texts: Dict[str, str]) -> Optional[Dict[str, Set[str]]]:
+    # every \bNAME\b compiled into one Hyperscan database: one pass per file
+    # reports all exported names it mentions. None when hyperscan is unavailable
+    if hyperscan is None:
+        return None
+    all_names = sorted({n for names in exports_map.values() for n in names})
+    if not all_names:
+        return {}
+    name_files: Dict[str, Set[str]] = {n: set() for n in all_names}
+    try:
+        db = hyperscan.Database()
+        # no HS_FLAG_UCP: Hyperscan rejects \b in UCP mode
+        flags = hyperscan.HS_FLAG_SINGLEMATCH | hyperscan.HS_FLAG_UTF8
+        db.compile(
+            expressions=[rf"\b{re.escape(n)}\b".encode() for n in all_names],
+            ids=list(range(len(all_names))),
+            elements=len(all_names),
+            flags=[flags] * len(all_names),
+        )
+        for f, txt in texts.items():
+            def on_match(idx, start, end, match_flags, context, f=f):
+                name_files[all_names[idx]].add(f)
+            db.scan(txt.encode("utf-8"), match_event_handler=on_match)
+    except hyperscan.error:
+        return None
+    return name_files
+
+def word_index_name_files(exports_map: Dict[str, List[str]], texts: Dict[str, str]) -> Dict[str, Set[str]]:
+    # inverted index: exported name -> files whose words include it; a name made
+    # of word chars matches \bname\b exactly when it is one of the file's words.
+    # Other names are left out and searched with a regex by the caller
+    exported = {n for names in exports_map.values() for n in names if WORD_RE.fullmatch(n)}
+    name_files: Dict[str, Set[str]] = {n: set() for n in exported}
+    for f, txt in texts.items():
+        for n in exported.intersection(WORD_RE.findall(txt)):
+            name_files[n].add(f)
+    return name_files
 
-def detect_unused_exports(all_files: List[str], imports_of: Dict[str, Set[str]]) -> Dict[str, List[str]]:
+def detect_unused_exports(all_files: List[str], imp_of: List[array.array]) -> Dict[str, List[str]]:
     exports_map: Dict[str, List[str]] = {}
     texts: Dict[str, str] = {}
     for f in all_files:
         try:
-            with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-                txt = fh.read()
-                texts[f] = txt
+            texts[f] = read_text(f)
         except Exception:
             texts[f] = ""
     for f, txt in texts.items():
@@ -380,16 +796,18 @@ def detect_unused_exports(all_files: List[str], imports_of: Dict[str, Set[str]])
                         names.append(name)
         if names:
             exports_map[f] = names
+    name_files = hyperscan_name_files(exports_map, texts)
+    if name_files is None:
+        name_files = word_index_name_files(exports_map, texts)
     unused: Dict[str, List[str]] = {}
     for f, names in exports_map.items():
         for name in names:
-            used = False
-            for other, txt in texts.items():
-                if other == f:
-                    continue
-                if re.search(rf"\b{name}\b", txt):
-                    used = True
-                    break
+            files = name_files.get(name)
+            if files is not None:
+                used = bool(files - {f})
+            else:
+                rx = re.compile(rf"\b{re.escape(name)}\b")
+                used = any(rx.search(txt) for other, txt in texts.items() if other != f)
             if not used:
                 unused.setdefault(f, []).append(name)
     return unused
@@ -400,37 +818,196 @@ def detect_unused_exports(all_files: List[str], imports_of: Dict[str, Set[str]])
 def now_ts() -> str:
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
+FICLONE = 0x40049409  # linux/fs.h
+REFLINK_OK = fcntl is not None and sys.platform.startswith("linux")
+
+def clone_file(src: str, dst: str):
+    # cheapest copy of one file for a snapshot: CoW reflink (btrfs/xfs), else a
+    # real copy. Hard links only when snapshot_hardlinks is on: the script never
+    # writes a linked file in place (see atomic_write), but an editor saving in
+    # place would change the snapshot too. Symlinks are followed like copytree does
+    global REFLINK_OK
+    if not SNAPSHOT_LINKS or os.path.islink(src):
+        shutil.copy2(src, dst)
+        return
+    if REFLINK_OK:
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            shutil.copystat(src, dst)
+            return
+        except OSError:
+            # filesystem without reflinks: don't try again for the rest of the run
+            REFLINK_OK = False
+            try:
+                os.remove(dst)
+            except OSError:
+                pass
+    if SNAPSHOT_HARDLINKS:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+def link_tree(src: str, dst: str):
+    # shutil.copytree replacement: same layout, files cloned with clone_file.
+    # The backup dir itself is skipped when it lives inside src
+    backup_abs = os.path.abspath(BACKUP_DIR)
+    os.makedirs(dst, exist_ok=True)
+    pairs: List[Tuple[str, str]] = []
+    for r, dirs, fs in os.walk(src):
+        rel = os.path.relpath(r, src)
+        out = dst if rel == "." else os.path.join(dst, rel)
+        keep: List[str] = []
+        for d in dirs:
+            p = os.path.join(r, d)
+            if os.path.abspath(p) == backup_abs:
+                continue
+            if os.path.islink(p):
+                shutil.copytree(p, os.path.join(out, d))
+                continue
+            os.makedirs(os.path.join(out, d), exist_ok=True)
+            keep.append(d)
+        dirs[:] = keep
+        for name in fs:
+            pairs.append((os.path.join(r, name), os.path.join(out, name)))
+    # directories exist now; the per-file clones are independent of each other
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for _ in pool.map(lambda pair: clone_file(*pair), pairs):
+            pass
+
+def atomic_write(path: str, data):
+    # write to a temp file next to path and rename it over: the file gets a new
+    # inode, so snapshots hard-linked to the old one are left untouched. A symlink
+    # is resolved first so the real file is replaced, not the link itself
+    path = os.path.realpath(path)
+    tmp = f"{path}.cleaner_tmp"
+    mode, kw = ("wb", {}) if isinstance(data, (bytes, bytearray)) else ("w", {"encoding": "utf-8"})
+    try:
+        with open(tmp, mode, **kw) as fh:
+            fh.write(data)
+        shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except Exception:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
 def create_snapshot(label: str) -> str:
     ts = now_ts()
     name = f"{ts}{label}".replace(" ", "")
     dest = os.path.join(BACKUP_DIR, name)
+    # built under a .partial name and renamed once complete, so a crash never
+    # leaves a half-written snapshot that list_snapshots would take as latest
+    partial = dest + ".partial"
     try:
-        shutil.copytree(PROJECT_ROOT, dest)
-        with open(os.path.join(dest, ".snapshot_meta.json"), "w", encoding="utf-8") as f:
+        link_tree(PROJECT_ROOT, partial)
+        with open(os.path.join(partial, ".snapshot_meta.json"), "w", encoding="utf-8") as f:
             json.dump({"label": label, "timestamp": ts}, f)
+        os.rename(partial, dest)
         trim_snapshots()
         log(f"Snapshot criado: {dest}")
         return dest
     except Exception as e:
         log(f"Falha ao criar snapshot: {e}")
+        discard_dir(partial)
         return ""
 
 def list_snapshots() -> List[str]:
     try:
-        items = sorted([os.path.join(BACKUP_DIR, d) for d in os.listdir(BACKUP_DIR)], reverse=True)
+        names = [d for d in os.listdir(BACKUP_DIR) if not d.startswith(".") and not d.endswith(".partial")]
+        items = sorted([os.path.join(BACKUP_DIR, d) for d in names], reverse=True)
         return [p for p in items if os.path.isdir(p)]
     except Exception:
         return []
 
+# old snapshots are renamed into BACKUP_DIR/.trash (instant) and deleted by a
+# background thread; pending deletions are finished at exit
+TRASH_DIR = os.path.join(BACKUP_DIR, ".trash")
+TRASH_QUEUE: "queue.Queue[str]" = queue.Queue()
+TRASH_WORKER: Optional[threading.Thread] = None
+
+def trash_worker():
+    while True:
+        path = TRASH_QUEUE.get()
+        try:
+            shutil.rmtree(path, ignore_errors=True)
+        finally:
+            TRASH_QUEUE.task_done()
+
+def queue_trash(path: str):
+    global TRASH_WORKER
+    if TRASH_WORKER is None:
+        TRASH_WORKER = threading.Thread(target=trash_worker, name="cleaner-trash", daemon=True)
+        TRASH_WORKER.start()
+        atexit.register(TRASH_QUEUE.join)
+    TRASH_QUEUE.put(path)
+
+def discard_dir(path: str):
+    if not os.path.exists(path):
+        return
+    try:
+        os.makedirs(TRASH_DIR, exist_ok=True)
+        holder = tempfile.mkdtemp(dir=TRASH_DIR)
+        os.rename(path, os.path.join(holder, os.path.basename(path)))
+        queue_trash(holder)
+    except OSError:
+        shutil.rmtree(path, ignore_errors=True)
+
 def trim_snapshots():
     snaps = list_snapshots()
+    # leftovers of runs that exited before their trash was emptied
+    try:
+        for d in os.listdir(TRASH_DIR):
+            queue_trash(os.path.join(TRASH_DIR, d))
+    except OSError:
+        pass
     if len(snaps) <= ALLOW_UNDO_COUNT:
         return
     for p in snaps[ALLOW_UNDO_COUNT:]:
-        try:
-            shutil.rmtree(p)
-        except Exception:
-            pass
+        discard_dir(p)
+
+def remove_path(path: str, is_dir: bool):
+    if is_dir:
+        shutil.rmtree(path)
+    else:
+        os.unlink(path)
+
+def sync_tree(snap_dir: str, work_dir: str, skip: Set[str]):
+    # make work_dir match snap_dir, touching only what differs: files still
+    # hard-linked to the snapshot (same inode), or with the same size and mtime
+    # as their reflink/copy (clone_file keeps mtimes), were never changed and are kept
+    snap = {e.name: e for e in os.scandir(snap_dir)}
+    work = {e.name: e for e in os.scandir(work_dir)}
+    for name, we in work.items():
+        if name not in snap and os.path.abspath(we.path) not in skip:
+            remove_path(we.path, we.is_dir(follow_symlinks=False))
+    for name, se in snap.items():
+        if os.path.abspath(se.path) in skip:
+            continue
+        target = os.path.join(work_dir, name)
+        we = work.get(name)
+        snap_is_dir = se.is_dir(follow_symlinks=False)
+        if we is not None:
+            work_is_dir = we.is_dir(follow_symlinks=False)
+            if snap_is_dir and work_is_dir:
+                sync_tree(se.path, target, skip)
+                continue
+            if not snap_is_dir and not work_is_dir:
+                ss, ws = se.stat(follow_symlinks=False), we.stat(follow_symlinks=False)
+                if (ss.st_ino, ss.st_dev) == (ws.st_ino, ws.st_dev):
+                    continue
+                if (ss.st_size, ss.st_mtime_ns) == (ws.st_size, ws.st_mtime_ns):
+                    continue
+            remove_path(we.path, work_is_dir)
+        if snap_is_dir:
+            link_tree(se.path, target)
+        else:
+            clone_file(se.path, target)
 
 def undo_last() -> bool:
     snaps = list_snapshots()
@@ -438,25 +1015,10 @@ def undo_last() -> bool:
         log("Nenhum snapshot para restaurar.")
         return False
     last = snaps[0]
+    TEXT_MEMO.clear()
     try:
-        for name in os.listdir(PROJECT_ROOT):
-            path = os.path.join(PROJECT_ROOT, name)
-            try:
-                if os.path.isdir(path):
-                    shutil.rmtree(path)
-                else:
-                    os.remove(path)
-            except Exception:
-                pass
-        for item in os.listdir(last):
-            if item == ".snapshot_meta.json":
-                continue
-            s = os.path.join(last, item)
-            d = os.path.join(PROJECT_ROOT, item)
-            if os.path.isdir(s):
-                shutil.copytree(s, d)
-            else:
-                shutil.copy2(s, d)
+        skip = {os.path.abspath(BACKUP_DIR), os.path.abspath(os.path.join(last, ".snapshot_meta.json"))}
+        sync_tree(last, PROJECT_ROOT, skip)
         log("Snapshot restaurado com sucesso.")
         return True
     except Exception as e:
@@ -474,36 +1036,118 @@ def show_preview(title: str, items: List[str]):
     for p in items:
         log(" - " + p)
 
+def import_candidates(files: List[str], stats: Dict[str, Tuple[int, int]], target_folder: str,
+                      normalize: bool = False) -> List[str]:
+    # reverse lookup through the per-file imports cached by analyze_project: a
+    # still-valid entry with no import into target_folder rules the file out
+    # without opening it; files without a valid entry stay candidates
+    cache = load_cache()
+    cached = imports_cache(cache, PROJECT_ROOT)
+    out: List[str] = []
+    for f in files:
+        entry = cached.get(f)
+        if entry and entry[2] is not None:
+            if (entry[0], entry[1]) == stats.get(f):
+                imps = [i.replace("\\", "/") for i in entry[2]] if normalize else entry[2]
+                if not any(target_folder in i for i in imps):
+                    continue
+        out.append(f)
+    return out
+
+def file_imports_into(path: str, handler: LanguageHandler, target_folder: str, normalize: bool = False) -> bool:
+    try:
+        with open(path, "rb") as fh:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return bool(handler.import_line_spans(mm, target_folder, normalize))
+    except (OSError, ValueError):
+        # ValueError: empty files cannot be mapped
+        return False
+
+def splice_bytes(buf, edits: List[Tuple[int, int, bytes]]) -> bytearray:
+    # edits: ascending, non-overlapping (start, end, replacement) ranges of buf
+    out = bytearray()
+    pos = 0
+    for a, b, repl in edits:
+        out += buf[pos:a]
+        out += repl
+        pos = b
+    out += buf[pos:]
+    return out
+
+def splice_in_place(path: str, size: int, edits: List[Tuple[int, int, bytes]], deltas: List[int]):
+    # same result as splice_bytes, but the bytes between edits are shifted inside
+    # the mapping (memmove) instead of being copied into a new buffer. Growing
+    # edits run back to front after the file is extended, shrinking ones front
+    # to back before it is truncated, so no byte is overwritten before it moves
+    new_size = size + sum(deltas)
+    shift_before = [0] * len(edits)
+    for i in range(1, len(edits)):
+        shift_before[i] = shift_before[i - 1] + deltas[i - 1]
+    growing = new_size > size
+    with open(path, "r+b") as fh:
+        if growing:
+            fh.truncate(new_size)
+        with mmap.mmap(fh.fileno(), 0) as mm:
+            for i in (reversed(range(len(edits))) if growing else range(len(edits))):
+                a, b, repl = edits[i]
+                tail_end = edits[i + 1][0] if i + 1 < len(edits) else size
+                shift = shift_before[i]
+                mm.move(b + shift + deltas[i], b, tail_end - b)
+                mm[a + shift:a + shift + len(repl)] = repl
+            mm.flush()
+        if not growing:
+            fh.truncate(new_size)
+
+def rewrite_import_lines(path: str, handler: LanguageHandler, target_folder: str, edit, normalize: bool = False) -> bool:
+    # edit(line) -> new line bytes, or None to drop the line. Works on the raw
+    # bytes: untouched regions are copied as-is, so encoding and line endings survive
+    with open(path, "rb") as fh:
+        nlink = os.fstat(fh.fileno()).st_nlink
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            spans = handler.import_line_spans(mm, target_folder, normalize)
+            if not spans:
+                return False
+            size = len(mm)
+            edits: List[Tuple[int, int, bytes]] = []
+            for start, end in spans:
+                # a span may hold several lines (multi-line import): edit each one
+                kept: List[bytes] = []
+                for line in mm[start:end].split(b"\n"):
+                    cr = line.endswith(b"\r")
+                    new = edit(line[:-1] if cr else line)
+                    if new is not None:
+                        kept.append(new + b"\r" if cr else new)
+                if kept:
+                    edits.append((start, end, b"\n".join(kept)))
+                else:
+                    edits.append((start, min(end + 1, size), b""))
+            deltas = [len(repl) - (b - a) for a, b, repl in edits]
+            # large files are edited in place, but only when no snapshot shares the
+            # inode (hard link) and all edits shift the same way
+            in_place = (size >= INPLACE_EDIT_BYTES and nlink == 1 and
+                        (all(d >= 0 for d in deltas) or all(d <= 0 for d in deltas)))
+            if not in_place:
+                out = splice_bytes(mm, edits)
+    if in_place:
+        splice_in_place(path, size, edits, deltas)
+    else:
+        atomic_write(path, out)
+    return True
+
+COMMENT_STYLE = {"python": (b"# ", b"  # removido pelo script")}
+
 def comment_imports(target_folder: str, dry_run: bool = False, assume_yes: bool = False):
-    files = build_file_list(PROJECT_ROOT)
+    files = import_candidates(*build_file_index(PROJECT_ROOT), target_folder, normalize=True)
     preview: List[str] = []
     for f in files:
         lang = detect_language_for_file(f)
         if not lang:
             continue
-        handler = LANG_HANDLERS.get(lang)
+        handler = get_handler(lang)
         if not handler:
             continue
-        try:
-            with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-                lines = fh.readlines()
-        except Exception:
-            continue
-        for line in lines:
-            for rx in handler.import_regexes:
-                m = rx.search(line)
-                if m:
-                    imp = None
-                    if m.lastindex and m.lastindex >= 1:
-                        imp = m.group(1)
-                    if not imp:
-                        imp = m.group(0)
-                    if target_folder in imp.replace("\\", "/"):
-                        preview.append(f)
-                        break
-            else:
-                continue
-            break
+        if file_imports_into(f, handler, target_folder, normalize=True):
+            preview.append(f)
     show_preview(f"Arquivos que terão imports comentados (folder={target_folder})", preview)
     if dry_run:
         log("Dry-run ativado: nada será alterado.")
@@ -514,61 +1158,27 @@ def comment_imports(target_folder: str, dry_run: bool = False, assume_yes: bool
             return
     create_snapshot(f"comment_imports_{target_folder}")
     for f in preview:
+        lang = detect_language_for_file(f)
+        # comment respecting common comment style: # for python, // for C-like and fallback
+        prefix, suffix = COMMENT_STYLE.get(lang, (b"// ", b" // removido pelo script"))
         try:
-            with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-                lines = fh.readlines()
-        except Exception:
-            continue
-        changed = False
-        new_lines: List[str] = []
-        handler = LANG_HANDLERS.get(detect_language_for_file(f))
-        for line in lines:
-            commented = False
-            for rx in handler.import_regexes:
-                if rx.search(line) and target_folder in line:
-                    # comment respecting common comment style: use // for C-like, # for python, // fallback
-                    lang = detect_language_for_file(f)
-                    if lang == "python":
-                        new_lines.append("# " + line.rstrip("\n") + "  # removido pelo script\n")
-                    elif lang in ("javascript", "typescript", "java", "csharp", "cpp", "go", "php"):
-                        new_lines.append("// " + line.rstrip("\n") + " // removido pelo script\n")
-                    else:
-                        new_lines.append("// " + line.rstrip("\n") + " // removido pelo script\n")
-                    commented = True
-                    changed = True
-                    break
-            if not commented:
-                new_lines.append(line)
-        if changed:
-            try:
-                with open(f, "w", encoding="utf-8") as fh:
-                    fh.writelines(new_lines)
+            if rewrite_import_lines(f, get_handler(lang), target_folder,
+                                    lambda line: prefix + line + suffix, normalize=True):
+                TEXT_MEMO.pop(f, None)
                 log(f"Arquivo modificado: {f}")
-            except Exception as e:
-                log(f"Falha ao escrever {f}: {e}")
+        except Exception as e:
+            log(f"Falha ao escrever {f}: {e}")
 
 def remove_imports(target_folder: str, dry_run: bool = False, assume_yes: bool = False):
-    files = build_file_list(PROJECT_ROOT)
+    files = import_candidates(*build_file_index(PROJECT_ROOT), target_folder)
     preview: List[str] = []
     for f in files:
         lang = detect_language_for_file(f)
         if not lang:
             continue
-        handler = LANG_HANDLERS.get(lang)
-        try:
-            with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-                text = fh.read()
-        except Exception:
-            continue
-        for rx in handler.import_regexes:
-            for m in rx.finditer(text):
-                imp = m.group(1) if m.lastindex and m.lastindex >= 1 else None
-                if imp and target_folder in imp:
-                    preview.append(f)
-                    break
-            else:
-                continue
-            break
+        handler = get_handler(lang)
+        if file_imports_into(f, handler, target_folder):
+            preview.append(f)
     show_preview(f"Arquivos com imports a remover (folder={target_folder})", preview)
     if dry_run:
         log("Dry-run ativado: nada será alterado.")
@@ -580,32 +1190,11 @@ def remove_imports(target_folder: str, dry_run: bool = False, assume_yes: bool =
     create_snapshot(f"remove_imports_{target_folder}")
     for f in preview:
         try:
-            with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-                lines = fh.readlines()
-        except Exception:
-            continue
-        new_lines: List[str] = []
-        removed = False
-        handler = LANG_HANDLERS.get(detect_language_for_file(f))
-        for line in lines:
-            keep = True
-            for rx in handler.import_regexes:
-                m = rx.search(line)
-                if m:
-                    imp = m.group(1) if m.lastindex and m.lastindex >= 1 else None
-                    if imp and target_folder in imp:
-                        keep = False
-                        removed = True
-                        break
-            if keep:
-                new_lines.append(line)
-        if removed:
-            try:
-                with open(f, "w", encoding="utf-8") as fh:
-                    fh.writelines(new_lines)
+            if rewrite_import_lines(f, get_handler(detect_language_for_file(f)), target_folder, lambda line: None):
+                TEXT_MEMO.pop(f, None)
                 log(f"Imports removidos em: {f}")
-            except Exception as e:
-                log(f"Falha ao escrever {f}: {e}")
+        except Exception as e:
+            log(f"Falha ao escrever {f}: {e}")
 
 def remove_folder(target_folder: str, dry_run: bool = False, assume_yes: bool = False):
     path = os.path.join(PROJECT_ROOT, target_folder)
@@ -632,8 +1221,8 @@ def remove_folder(target_folder: str, dry_run: bool = False, assume_yes: bool =
         log(f"Falha ao remover pasta: {e}")
 
 def detect_and_handle_dead(dry_run: bool = False, assume_yes: bool = False, use_cache: bool = True):
-    all_files, referenced_by, imports_of = analyze_project(PROJECT_ROOT, use_cache=use_cache)
-    dead = detect_dead_files(all_files, referenced_by)
+    all_files, ref_by, imp_of = analyze_project(PROJECT_ROOT, use_cache=use_cache)
+    dead = detect_dead_files(all_files, ref_by)
     show_preview("Arquivos possivelmente mortos", dead)
     if not dead:
         log("Nenhum arquivo morto detectado.")
@@ -661,20 +1250,17 @@ def detect_and_handle_dead(dry_run: bool = False, assume_yes: bool = False, use_
     log("Operação de dead code finalizada.")
 
 def detect_broken_imports(use_cache: bool = True) -> List[Tuple[str, str]]:
-    all_files, referenced_by, imports_of = analyze_project(PROJECT_ROOT, use_cache=use_cache)
-    all_set = set(all_files)
+    # imports come from the analysis pass; no file is read a second time
+    imports_by_file: Dict[str, List[str]] = {}
+    all_files, ref_by, imp_of = analyze_project(PROJECT_ROOT, use_cache=use_cache, imports_out=imports_by_file)
+    all_set = frozenset(all_files)
     broken: List[Tuple[str, str]] = []
     for src in all_files:
-        lang = detect_language_for_file(src)
-        if not lang:
+        imps = imports_by_file.get(src)
+        if not imps:
             continue
-        handler = LANG_HANDLERS.get(lang)
-        try:
-            with open(src, "r", encoding="utf-8", errors="ignore") as fh:
-                text = fh.read()
-        except Exception:
-            continue
-        imps = handler.extract_imports(text)
+        lang = detect_language_for_file(src)
+        handler = get_handler(lang)
         for imp in imps:
             if imp and handler.resolve_import(src, imp, all_set) is None:
                 # if looks like local-ish import (contains '.' or '/'), mark broken
@@ -689,16 +1275,15 @@ def move_and_fix(src_rel: str, dest_rel: str, dry_run: bool = False, assume_yes:
         log("Origem não existe: " + abs_src)
         return
     all_files = build_file_list(PROJECT_ROOT)
-    all_set = set(all_files)
+    all_set = frozenset(all_files)
     affected: Set[str] = set()
     for f in all_files:
         lang = detect_language_for_file(f)
         if not lang:
             continue
-        handler = LANG_HANDLERS.get(lang)
+        handler = get_handler(lang)
         try:
-            with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-                txt = fh.read()
+            txt = read_text(f)
         except Exception:
             continue
         for imp in handler.extract_imports(txt):
@@ -723,11 +1308,10 @@ def move_and_fix(src_rel: str, dest_rel: str, dry_run: bool = False, assume_yes:
     new_rel = os.path.relpath(abs_dest, PROJECT_ROOT).replace("\\", "/")
     for f in affected:
         try:
-            with open(f, "r", encoding="utf-8", errors="ignore") as fh:
-                txt = fh.read()
+            txt = read_text(f)
             new_txt = txt.replace(old_rel, new_rel)
-            with open(f, "w", encoding="utf-8") as fh:
-                fh.write(new_txt)
+            atomic_write(f, new_txt)
+            TEXT_MEMO.pop(f, None)
             log(f"Atualizado: {f}")
         except Exception as e:
             log(f"Falha ao atualizar {f}: {e}")
@@ -774,12 +1358,12 @@ def main():
     log(f"Executando comando: {args.cmd}")
 
     if args.cmd == "scan":
-        all_files, referenced_by, imports_of = analyze_project(PROJECT_ROOT, use_cache=use_cache)
+        all_files, ref_by, imp_of = analyze_project(PROJECT_ROOT, use_cache=use_cache)
         log(f"Arquivos analisados: {len(all_files)}")
-        dead = detect_dead_files(all_files, referenced_by)
+        dead = detect_dead_files(all_files, ref_by)
         show_preview("Possíveis dead files", dead)
         if getattr(args, "detailed_unused_exports", False):
-            unused = detect_unused_exports(all_files, imports_of)
+            unused = detect_unused_exports(all_files, imp_of)
             log("Possíveis exports não usados:")
             for f, names in unused.items():
                 log(f" - {f}: {', '.join(names)}")
@@ -808,7 +1392,7 @@ def main():
     else:
         log("Comando desconhecido")
 
-if _name_ == '_main_':
+if __name__ == '__main__':
     try:
         main()
     except KeyboardInterrupt:
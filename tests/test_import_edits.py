@@ -0,0 +1,156 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cleaner_multi as cm
+
+
+class ImportEditTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        os.makedirs(os.path.join("src", "app"))
+        os.makedirs(os.path.join("src", "target"))
+        self.write("src/target/x.js", b"export const a = 1;\n")
+        self.write("src/target/y.py", b"a = 1\n")
+        self.root = cm.PROJECT_ROOT
+        cm.PROJECT_ROOT = "src"
+        cm.TEXT_MEMO.clear()
+
+    def tearDown(self):
+        cm.PROJECT_ROOT = self.root
+        cm.TEXT_MEMO.clear()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def write(self, path, data):
+        with open(path, "wb") as fh:
+            fh.write(data)
+
+    def read(self, path):
+        with open(path, "rb") as fh:
+            return fh.read()
+
+    def test_remove_multiline_import(self):
+        self.write("src/app/main.js",
+                   b"import {\n  a,\n  b\n} from '../target/x';\nimport c from './c';\nconsole.log(c);\n")
+        cm.remove_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.js"), b"import c from './c';\nconsole.log(c);\n")
+
+    def test_comment_multiline_import(self):
+        self.write("src/app/main.js", b"import {\n  a\n} from '../target/x';\nrun();\n")
+        cm.comment_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.js"),
+                         b"// import { // removido pelo script\n"
+                         b"//   a // removido pelo script\n"
+                         b"// } from '../target/x'; // removido pelo script\n"
+                         b"run();\n")
+
+    def test_remove_keeps_crlf(self):
+        self.write("src/app/main.js",
+                   b"import {\r\n  a\r\n} from '../target/x';\r\nimport z from '../target/x';\r\nrun();\r\n")
+        cm.remove_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.js"), b"run();\r\n")
+
+    def test_comment_keeps_crlf(self):
+        self.write("src/app/main.js", b"import z from '../target/x';\r\nrun();\r\n")
+        cm.comment_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.js"),
+                         b"// import z from '../target/x'; // removido pelo script\r\nrun();\r\n")
+
+    def test_remove_require(self):
+        self.write("src/app/main.js",
+                   b"const x = require('../target/x');\nconst y = require(\n  '../target/x'\n);\nrun(x, y);\n")
+        cm.remove_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.js"), b"run(x, y);\n")
+
+    def test_comment_require(self):
+        self.write("src/app/main.js", b"const x = require('../target/x');\nrun(x);\n")
+        cm.comment_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.js"),
+                         b"// const x = require('../target/x'); // removido pelo script\nrun(x);\n")
+
+    def test_remove_keeps_code_after_import_word_in_comment(self):
+        self.write("src/app/main.js",
+                   b"// we import helpers below\nconst keep = compute();\n"
+                   b"export function important() {\n  return keep;\n}\n"
+                   b"import { y } from \"../target/x\";\n")
+        cm.remove_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.js"),
+                         b"// we import helpers below\nconst keep = compute();\n"
+                         b"export function important() {\n  return keep;\n}\n")
+
+    def test_blank_lines_before_import_are_kept(self):
+        self.write("src/app/main.py", b"x = 1\n\n\nimport target.y\nprint(x)\n")
+        self.write("src/app/Main.java", b"package app;\n\n\nimport target.Foo;\nclass Main {}\n")
+        cm.comment_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.py"),
+                         b"x = 1\n\n\n# import target.y  # removido pelo script\nprint(x)\n")
+        self.assertEqual(self.read("src/app/Main.java"),
+                         b"package app;\n\n\n// import target.Foo; // removido pelo script\nclass Main {}\n")
+        self.write("src/app/main.py", b"x = 1\n\n\nimport target.y\nprint(x)\n")
+        self.write("src/app/Main.java", b"package app;\n\n\nimport target.Foo;\nclass Main {}\n")
+        cm.remove_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.py"), b"x = 1\n\n\nprint(x)\n")
+        self.assertEqual(self.read("src/app/Main.java"), b"package app;\n\n\nclass Main {}\n")
+
+    def test_paren_in_trailing_comment_does_not_extend(self):
+        self.write("src/app/main.py", b"from target.y import a  # see (docs\nconfig = load()\n")
+        cm.remove_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.py"), b"config = load()\n")
+
+    def test_remove_go_block_entry(self):
+        self.write("src/app/main.go", b"package main\nimport (\n\t\"../target/x\"\n\t\"os\"\n)\n")
+        cm.remove_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.go"), b"package main\nimport (\n\t\"os\"\n)\n")
+
+    def test_rewrite_in_place(self):
+        body = (b"import {\r\n  a\r\n} from '../target/x';\r\nrun();\r\n"
+                + b"// filler\r\n" * 50 + b"import z from '../target/x';\r\nend();\r\n")
+        limit, splice = cm.INPLACE_EDIT_BYTES, cm.splice_in_place
+        calls = []
+
+        def record(*args):
+            calls.append(args[0])
+            splice(*args)
+        cm.INPLACE_EDIT_BYTES, cm.splice_in_place = 1, record
+        try:
+            handler = cm.get_handler("javascript")
+            self.write("src/app/main.js", body)
+            self.assertTrue(cm.rewrite_import_lines("src/app/main.js", handler, "target",
+                                                    lambda line: b"// " + line))
+            self.assertEqual(self.read("src/app/main.js"),
+                             b"// import {\r\n//   a\r\n// } from '../target/x';\r\nrun();\r\n"
+                             + b"// filler\r\n" * 50 + b"// import z from '../target/x';\r\nend();\r\n")
+            self.write("src/app/main.js", body)
+            self.assertTrue(cm.rewrite_import_lines("src/app/main.js", handler, "target", lambda line: None))
+            self.assertEqual(self.read("src/app/main.js"), b"run();\r\n" + b"// filler\r\n" * 50 + b"end();\r\n")
+        finally:
+            cm.INPLACE_EDIT_BYTES, cm.splice_in_place = limit, splice
+        self.assertEqual(calls, ["src/app/main.js"] * 2)
+
+    @unittest.skipUnless(hasattr(os, "symlink"), "symlinks not supported")
+    def test_remove_writes_through_symlink(self):
+        os.makedirs("shared")
+        self.write("shared/real.js", b"import a from '../target/x';\nrun();\n")
+        os.symlink(os.path.join("..", "..", "shared", "real.js"), "src/app/link.js")
+        cm.remove_imports("target", assume_yes=True)
+        self.assertTrue(os.path.islink("src/app/link.js"))
+        self.assertEqual(self.read("shared/real.js"), b"run();\n")
+
+    def test_comment_parenthesized_python_import(self):
+        self.write("src/app/main.py", b"from target.y import (\n    a,\n)\nprint(a)\n")
+        cm.comment_imports("target", assume_yes=True)
+        self.assertEqual(self.read("src/app/main.py"),
+                         b"# from target.y import (  # removido pelo script\n"
+                         b"#     a,  # removido pelo script\n"
+                         b"# )  # removido pelo script\n"
+                         b"print(a)\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
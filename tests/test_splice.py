@@ -0,0 +1,43 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cleaner_multi as cm
+
+
+def random_edits(rng, size, growing):
+    # ascending, non-overlapping ranges whose deltas all share one sign
+    points = sorted(rng.sample(range(size + 1), rng.randint(1, min(8, (size + 1) // 2)) * 2))
+    edits = []
+    for a, b in zip(points[::2], points[1::2]):
+        if growing:
+            repl = bytes(rng.randrange(256) for _ in range(b - a + rng.randint(0, 20)))
+        else:
+            repl = bytes(rng.randrange(256) for _ in range(rng.randint(0, b - a)))
+        edits.append((a, b, repl))
+    return edits
+
+
+class SpliceTest(unittest.TestCase):
+    def test_in_place_matches_splice_bytes(self):
+        rng = random.Random(1234)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "f.bin")
+            for _ in range(300):
+                size = rng.randint(1, 400)
+                data = bytes(rng.randrange(256) for _ in range(size))
+                edits = random_edits(rng, size, rng.random() < 0.5)
+                deltas = [len(repl) - (b - a) for a, b, repl in edits]
+                with open(path, "wb") as fh:
+                    fh.write(data)
+                cm.splice_in_place(path, size, edits, deltas)
+                with open(path, "rb") as fh:
+                    self.assertEqual(fh.read(), bytes(cm.splice_bytes(data, edits)), (data, edits))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cleaner_multi as cm
+
+
+def tree_state(root, skip=()):
+    state = {}
+    for r, dirs, fs in os.walk(root):
+        dirs[:] = [d for d in dirs if os.path.join(r, d) not in skip]
+        rel = os.path.relpath(r, root)
+        for d in dirs:
+            state[os.path.normpath(os.path.join(rel, d))] = "dir"
+        for name in fs:
+            with open(os.path.join(r, name), "rb") as fh:
+                state[os.path.normpath(os.path.join(rel, name))] = fh.read()
+    return state
+
+
+class UndoTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.saved = (cm.PROJECT_ROOT, cm.SNAPSHOT_LINKS, cm.SNAPSHOT_HARDLINKS, cm.REFLINK_OK, cm.clone_file)
+        cm.PROJECT_ROOT = "src"
+        for path, data in (("src/keep.js", b"keep\n"), ("src/edit.js", b"edit\n"),
+                           ("src/gone.js", b"gone\n"), ("src/was_file", b"file\n"),
+                           ("src/was_dir/inner.js", b"inner\n")):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fh:
+                fh.write(data)
+
+    def tearDown(self):
+        cm.PROJECT_ROOT, cm.SNAPSHOT_LINKS, cm.SNAPSHOT_HARDLINKS, cm.REFLINK_OK, cm.clone_file = self.saved
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def mutate(self):
+        # older mtimes would make an edit look unchanged to the size+mtime check
+        time.sleep(0.01)
+        cm.atomic_write("src/edit.js", b"edited, longer\n")
+        os.remove("src/gone.js")
+        with open("src/added.js", "wb") as fh:
+            fh.write(b"added\n")
+        os.remove("src/was_file")
+        os.makedirs("src/was_file")
+        with open("src/was_file/new.js", "wb") as fh:
+            fh.write(b"new\n")
+        cm.remove_path("src/was_dir", True)
+        with open("src/was_dir", "wb") as fh:
+            fh.write(b"now a file\n")
+
+    def undo_and_record_clones(self):
+        cloned = []
+        clone = self.saved[4]
+
+        def record(src, dst):
+            cloned.append(os.path.relpath(dst, "src"))
+            clone(src, dst)
+        cm.clone_file = record
+        self.assertTrue(cm.undo_last())
+        cm.clone_file = clone
+        return cloned
+
+    def check_restore(self):
+        before = tree_state("src")
+        self.assertTrue(cm.create_snapshot("t"))
+        self.mutate()
+        cloned = self.undo_and_record_clones()
+        self.assertEqual(tree_state("src"), before)
+        self.assertNotIn("keep.js", cloned)
+        self.assertIn("edit.js", cloned)
+        return cloned
+
+    def test_restore_with_copies(self):
+        cm.SNAPSHOT_LINKS = False
+        self.check_restore()
+
+    def test_restore_with_hardlinks(self):
+        cm.REFLINK_OK = False
+        cm.SNAPSHOT_HARDLINKS = True
+        snap = cm.create_snapshot("t")
+        self.assertEqual(os.stat("src/keep.js").st_ino, os.stat(os.path.join(snap, "keep.js")).st_ino)
+        self.mutate()
+        cloned = self.undo_and_record_clones()
+        self.assertNotIn("keep.js", cloned)
+        self.assertIn("edit.js", cloned)
+        self.assertEqual(tree_state("src")["was_dir"], "dir")
+        self.assertEqual(tree_state("src")["was_file"], b"file\n")
+
+    def test_backup_dir_under_root_survives(self):
+        cm.PROJECT_ROOT = "."
+        cm.SNAPSHOT_LINKS = False
+        backup = os.path.abspath(cm.BACKUP_DIR)
+        before = tree_state(".", skip=(os.path.join(".", cm.BACKUP_DIR), os.path.join(".", cm.LOG_DIR)))
+        snap = cm.create_snapshot("t")
+        self.mutate()
+        self.assertTrue(cm.undo_last())
+        self.assertTrue(os.path.isdir(snap))
+        self.assertTrue(os.path.isdir(backup))
+        after = tree_state(".", skip=(os.path.join(".", cm.BACKUP_DIR), os.path.join(".", cm.LOG_DIR)))
+        self.assertEqual(after, before)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cleaner_multi as cm
+
+
+class NameFilesTest(unittest.TestCase):
+    exports_map = {
+        "src/a.js": ["helper", "unused", "Widget"],
+        "src/b.py": ["parse", "load_all"],
+    }
+    texts = {
+        "src/a.js": "export function helper() {}\nexport const unused = 1;\nexport class Widget {}\n",
+        "src/b.py": "def parse(s):\n    return s\n\ndef load_all():\n    pass\n",
+        "src/c.js": "import { helper } from './a';\nconst w = new Widget();\nhelperish();\n",
+        "src/d.py": "from b import parse\n# ação: parse(x), load_allx()\n",
+        "src/e.js": "",
+    }
+
+    @unittest.skipUnless(cm.hyperscan, "hyperscan not installed")
+    def test_hyperscan_matches_word_index(self):
+        result = cm.hyperscan_name_files(self.exports_map, self.texts)
+        self.assertIsNotNone(result)
+        self.assertEqual(result, cm.word_index_name_files(self.exports_map, self.texts))
+        self.assertEqual(result["helper"], {"src/a.js", "src/c.js"})
+        self.assertEqual(result["load_all"], {"src/b.py"})
+
+
+if __name__ == "__main__":
+    unittest.main()